@@ -5,21 +5,26 @@ import json
 import multiprocessing
 
 
-# Using fork can crash the subprocess, use spawn instead
-multiprocessing.set_start_method("spawn")
+# Using fork can crash the subprocess, use forkserver instead. It forks from a
+# clean single threaded server, which has this script preloaded so children
+# are not left to re-import it the way spawn does
+multiprocessing.set_start_method("forkserver", force=True)
+multiprocessing.set_forkserver_preload(["__main__"])
 
 
 import asyncio
+import functools
 import os
 import pwd
 import random
 import re
 import resource
+import select
 import subprocess
 import sys
 import tempfile
 import textwrap
-import time
+from collections import deque
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -27,16 +32,25 @@ from enum import Enum
 from typing import (
     Any,
     Callable,
+    Deque,
+    Dict,
     Generator,
     List,
     Optional,
     Sequence,
+    Set,
     Tuple,
     TypedDict,
     Union,
 )
 
 
+# Size of each read from a subprocess pipe
+READ_CHUNK_SIZE = 65536
+# Streamed output is shown as it arrives, so only its tail needs to be kept
+MAX_STREAMED_OUTPUT_BYTES = 16 * 1024 * 1024
+
+
 @dataclass
 class RunResult:
     exit_code: int
@@ -51,12 +65,65 @@ class RunResult:
         return self.exit_code == 0
 
 
+class RingBuffer:
+    """Accumulates chunks of output, keeping only the last `maxbytes` if set"""
+
+    def __init__(self, maxbytes: Optional[int] = None) -> None:
+        self.maxbytes = maxbytes
+        self.chunks: Deque[bytes] = deque()
+        self.size = 0
+        self.truncated = False
+
+    def append(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.maxbytes is None:
+            return
+        # Evict whole chunks while the remainder still fills the buffer
+        while self.size - len(self.chunks[0]) >= self.maxbytes:
+            self.size -= len(self.chunks.popleft())
+            self.truncated = True
+
+    def getvalue(self) -> bytes:
+        output = b"".join(self.chunks)
+        if self.maxbytes is None or not (self.truncated or self.size > self.maxbytes):
+            return output
+        output = output[-self.maxbytes :]
+        newline = output.find(b"\n")
+        if newline != -1:
+            # Drop the partial first line
+            return output[newline + 1 :]
+        # Without a newline to cut at, at least drop the UTF-8 continuation
+        # bytes of a partial first character so the output still decodes
+        start = 0
+        while start < len(output) and 0x80 <= output[start] < 0xC0:
+            start += 1
+        return output[start:]
+
+
 class Shell:
-    def run(self, command: Sequence[str], stream_output: bool = False) -> RunResult:
+    def run(
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
+    ) -> RunResult:
+        """
+        Run a command, capturing its output
+        Streamed output is capped at MAX_STREAMED_OUTPUT_BYTES unless
+        `max_output_bytes` says otherwise
+        """
+        raise NotImplementedError()
+
+    def run_attached(self, command: Sequence[str]) -> RunResult:
+        """Run a command writing directly to our stdout, so no output is captured"""
         raise NotImplementedError()
 
     async def gen_run(
-        self, command: Sequence[str], stream_output: bool = False
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
     ) -> RunResult:
         raise NotImplementedError()
 
@@ -65,63 +132,101 @@ class Shell:
 class LocalShell(Shell):
     verbose: bool = False
 
-    def run(self, command: Sequence[str], stream_output: bool = False) -> RunResult:
-        # Write to a temp file, stream to stdout
-        tmpname = tempfile.mkstemp()[1]
-        with open(tmpname, "wb") as writer, open(tmpname, "rb") as reader:
-            if self.verbose:
-                print(f"+ {' '.join(command)}")
-            process = subprocess.Popen(command, stdout=writer, stderr=writer)
-            output = b""
-            while process.poll() is None:
-                chunk = reader.read()
-                output += chunk
-                if stream_output:
-                    sys.stdout.write(chunk.decode("utf-8"))
-                time.sleep(0.1)
-            output += reader.read()
-        return RunResult(process.returncode, output)
-
-    async def gen_run(
-        self, command: Sequence[str], stream_output: bool = False
+    def run(
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
     ) -> RunResult:
-        # Write to a temp file, stream to stdout
-        tmpname = tempfile.mkstemp()[1]
-        with open(tmpname, "wb") as writer, open(tmpname, "rb") as reader:
-            if self.verbose:
-                print(f"+ {' '.join(command)}")
-            try:
-                process = await asyncio.create_subprocess_exec(
-                    command[0], *command[1:], stdout=writer, stderr=writer
-                )
-            except Exception as e:
-                raise Exception(f"Failed running {command}") from e
-            output = b""
+        if self.verbose:
+            print(f"+ {' '.join(command)}")
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # Read straight from the pipe without an intermediate buffer copy
+            bufsize=0,
+        )
+        assert process.stdout is not None, "Process must have a stdout pipe"
+        if max_output_bytes is None and stream_output:
+            max_output_bytes = MAX_STREAMED_OUTPUT_BYTES
+        output = RingBuffer(max_output_bytes)
+        if stream_output:
+            # Chunks bypass the text layer, so flush anything already printed
+            sys.stdout.flush()
+        # Block on the pipe until EOF rather than polling the process
+        with process.stdout as reader:
             while True:
-                wait_task = asyncio.create_task(process.wait())
-                finished, running = await asyncio.wait({wait_task}, timeout=1)
-                assert bool(finished) ^ bool(
-                    running
-                ), "Cannot have both finished and running"
-                if finished:
+                chunk = reader.read(READ_CHUNK_SIZE)
+                if not chunk:
                     break
-                chunk = reader.read()
-                output += chunk
+                output.append(chunk)
                 if stream_output:
-                    sys.stdout.write(chunk.decode("utf-8"))
-                await asyncio.sleep(0.1)
-            output += reader.read()
-        exit_code = process.returncode
-        assert exit_code is not None, "Process must have exited"
-        return RunResult(exit_code, output)
+                    sys.stdout.buffer.write(chunk)
+                    sys.stdout.buffer.flush()
+        process.wait()
+        return RunResult(process.returncode, output.getvalue())
+
+    def run_attached(self, command: Sequence[str]) -> RunResult:
+        if self.verbose:
+            print(f"+ {' '.join(command)}")
+        sys.stdout.flush()
+        # The child inherits our stdio, so its output never passes through python
+        return RunResult(subprocess.call(command), b"")
+
+    async def gen_run(
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
+    ) -> RunResult:
+        if self.verbose:
+            print(f"+ {' '.join(command)}")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                command[0],
+                *command[1:],
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+        except Exception as e:
+            raise Exception(f"Failed running {command}") from e
+        assert process.stdout is not None, "Process must have a stdout pipe"
+        if max_output_bytes is None and stream_output:
+            max_output_bytes = MAX_STREAMED_OUTPUT_BYTES
+        output = RingBuffer(max_output_bytes)
+        if stream_output:
+            # Chunks bypass the text layer, so flush anything already printed
+            sys.stdout.flush()
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            output.append(chunk)
+            if stream_output:
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+        exit_code = await process.wait()
+        return RunResult(exit_code, output.getvalue())
 
 
 class FakeShell(Shell):
-    def run(self, command: Sequence[str], stream_output: bool = False) -> RunResult:
+    def run(
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
+    ) -> RunResult:
         return RunResult(0, b"output")
 
+    def run_attached(self, command: Sequence[str]) -> RunResult:
+        return RunResult(0, b"")
+
     async def gen_run(
-        self, command: Sequence[str], stream_output: bool = False
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
     ) -> RunResult:
         return RunResult(0, b"async output")
 
@@ -145,19 +250,24 @@ except ImportError:
     install_dependency("click")
     import click
 
+# orjson is optional, it only speeds up parsing large json outputs
 try:
-    import psutil
+    from orjson import loads as json_loads
 except ImportError:
-    install_dependency("psutil")
-    import psutil
+    from json import loads as json_loads
 
 
+@functools.lru_cache(maxsize=None)
 def get_current_user() -> str:
     return pwd.getpwuid(os.getuid())[0]
 
 
 def get_utc_timestamp(dt: datetime) -> str:
-    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    # Same as dt.strftime("%Y-%m-%dT%H:%M:%S.000Z") without parsing the format
+    return (
+        f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+        f"T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.000Z"
+    )
 
 
 @click.group()
@@ -210,6 +320,11 @@ class FakeFilesystem(Filesystem):
         return
 
 
+def get_temp_dir() -> Optional[str]:
+    # Prefer tmpfs where available, temp files never need to hit the disk
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
 class LocalFilesystem(Filesystem):
     def write(self, filename: str, contents: bytes) -> None:
         with open(filename, "wb") as f:
@@ -220,7 +335,9 @@ class LocalFilesystem(Filesystem):
             return f.read()
 
     def mkstemp(self) -> str:
-        return tempfile.mkstemp()[1]
+        fd, filename = tempfile.mkstemp(dir=get_temp_dir())
+        os.close(fd)
+        return filename
 
     def rlimit(self, resource_type: int, soft: int, hard: int) -> None:
         resource.setrlimit(resource_type, (soft, hard))
@@ -242,6 +359,13 @@ DEVINFRA_GRAFANA_BASE_URL = (
     "https://o11y.aptosdev.com/grafana/d/overview/overview?orgId=1&refresh=10s&"
     "var-Datasource=Remote%20Prometheus%20Devinfra"
 )
+VAL0_HOSTNAME = "aptos-node-0-validator-0"
+ES_PHRASE_FILTER = (
+    "('$state':(store:appState),"
+    "meta:(alias:!n,disabled:!f,index:'%(index)s',key:%(key)s,negate:!f,"
+    "params:(query:%(value)s),type:phrase),"
+    "query:(match_phrase:(%(key)s:%(value)s)))"
+)
 HUMIO_LOGS_LINK = (
     "https://cloud.us.humio.com/k8s/search?query=%24forgeLogs%28validator_insta"
     "nce%3D%2A%29%20%7C%20$FORGE_NAMESPACE%20&live=false&start=1661893461000&en"
@@ -268,6 +392,18 @@ def prometheus_port_forward() -> None:
     os.execvp("kubectl", ["kubectl", "port-forward", "prometheus", "9090"])
 
 
+# How long to wait for a terminated process to exit before killing it
+PROCESS_TERMINATE_TIMEOUT_SECS = 10
+
+
+def open_pidfd(pid: int) -> Optional[int]:
+    """Get a pollable handle on the process, if the platform supports it"""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
 class Process:
     def name(self) -> str:
         raise NotImplementedError()
@@ -275,14 +411,10 @@ class Process:
     def kill(self) -> None:
         raise NotImplementedError()
 
-    def ppid(self) -> int:
-        raise NotImplementedError()
-
 
 @dataclass
 class FakeProcess(Process):
     _name: str
-    _ppid: int
 
     def name(self) -> str:
         return self._name
@@ -290,17 +422,8 @@ class FakeProcess(Process):
     def kill(self) -> None:
         print(f"killing {self._name}")
 
-    def ppid(self) -> int:
-        return self._ppid
-
 
 class Processes:
-    def processes(self) -> Generator[Process, None, None]:
-        raise NotImplementedError()
-
-    def get_pid(self) -> int:
-        raise NotImplementedError()
-
     def spawn(self, target: Callable[[], None]) -> Process:
         raise NotImplementedError()
 
@@ -308,46 +431,33 @@ class Processes:
         raise NotImplementedError()
 
 
-@dataclass
-class SystemProcess(Process):
-    process: psutil.Process
-
-    def name(self) -> str:
-        return self.process.name()
-
-    def kill(self) -> None:
-        self.process.kill()
-
-
 @dataclass
 class MultiProcessingProcess(Process):
     process: multiprocessing.Process
+    pidfd: Optional[int] = None
 
     def name(self) -> str:
         return self.process.name
 
-    def ppid(self) -> int:
-        # Since we spawn this process for all intents and purposes we are its
-        # parent process
-        return os.getpid()
-
     def kill(self) -> None:
         self.process.terminate()
+        if self.pidfd is not None:
+            # The pidfd becomes readable once the process has exited
+            poller = select.poll()
+            poller.register(self.pidfd, select.POLLIN)
+            if not poller.poll(PROCESS_TERMINATE_TIMEOUT_SECS * 1000):
+                self.process.kill()
+            os.close(self.pidfd)
+            self.pidfd = None
         self.process.join()
 
 
 class SystemProcesses(Processes):
-    def processes(self) -> Generator[Process, None, None]:
-        for process in psutil.process_iter():
-            yield SystemProcess(process)
-
-    def get_pid(self) -> int:
-        return os.getpid()
-
     def spawn(self, target: Callable[[], None]) -> Process:
         process = multiprocessing.Process(daemon=True, target=target)
         process.start()
-        return MultiProcessingProcess(process)
+        assert process.pid is not None, "Process must have started"
+        return MultiProcessingProcess(process, open_pidfd(process.pid))
 
     def atexit(self, callback: Callable[[], None]) -> None:
         atexit.register(callback)
@@ -357,14 +467,8 @@ class FakeProcesses(Processes):
     def __init__(self) -> None:
         self.exit_callbacks = []
 
-    def processes(self) -> Generator[Process, None, None]:
-        yield FakeProcess("concensus", 1)
-
-    def get_pid(self) -> int:
-        return 2
-
     def spawn(self, target: Callable[[], None]) -> Process:
-        return FakeProcess("child", 2)
+        return FakeProcess("child")
 
     def atexit(self, callback: Callable[[], None]) -> None:
         return self.exit_callbacks.append(callback)
@@ -382,7 +486,7 @@ class ForgeResult:
     def __init__(self):
         self.state: ForgeState = ForgeState.EMPTY
         self.output: str = ""
-        self.debugging_output: str = ""
+        self._debugging_output: Union[str, Callable[[], str]] = ""
         self._start_time: Optional[datetime] = None
         self._end_time: Optional[datetime] = None
 
@@ -396,6 +500,12 @@ class ForgeResult:
         assert self._end_time is not None, "end_time is not set"
         return self._end_time
 
+    @property
+    def debugging_output(self) -> str:
+        if callable(self._debugging_output):
+            self._debugging_output = self._debugging_output()
+        return self._debugging_output
+
     @classmethod
     def from_args(cls, state: ForgeState, output: str) -> "ForgeResult":
         result = cls()
@@ -417,8 +527,9 @@ class ForgeResult:
         result._start_time = context.time.now()
         try:
             yield result
+            # Only failures report the forge state, so defer dumping it
             result.set_debugging_output(
-                dump_forge_state(context.shell, context.forge_namespace)
+                lambda: dump_forge_state(context.shell, context.forge_namespace)
             )
         except Exception as e:
             result.set_state(ForgeState.FAIL)
@@ -439,8 +550,9 @@ class ForgeResult:
     def set_output(self, output: str) -> None:
         self.output = output
 
-    def set_debugging_output(self, output: str) -> None:
-        self.debugging_output = output
+    def set_debugging_output(self, output: Union[str, Callable[[], str]]) -> None:
+        """Set the debugging output, or a callable producing it when first read"""
+        self._debugging_output = output
 
     def format(self) -> str:
         return f"Forge {self.state.value.lower()}ed"
@@ -451,7 +563,7 @@ class ForgeResult:
 
 class Time:
     def epoch(self) -> str:
-        return self.now().strftime("%s")
+        return str(int(self.now().timestamp()))
 
     def now(self) -> datetime:
         raise NotImplementedError()
@@ -510,14 +622,18 @@ class ForgeContext:
     github_job_url: Optional[str]
 
     def report(self, result: ForgeResult, outputs: List[ForgeFormatter]) -> None:
+        # The same format may be written to several files, only render it once
+        rendered: Dict[Callable[[ForgeContext, ForgeResult], str], str] = {}
         for formatter in outputs:
-            output = formatter.format(self, result)
+            if formatter.format_fn not in rendered:
+                rendered[formatter.format_fn] = formatter.format(self, result)
+            output = rendered[formatter.format_fn]
             print(f"=== Start {formatter} ===")
             print(output)
             print(f"=== End {formatter} ===")
             self.filesystem.write(formatter.filename, output.encode())
 
-    @property
+    @functools.cached_property
     def forge_chain_name(self) -> str:
         forge_chain_name = self.forge_cluster_name.lstrip("aptos-")
         if "forge" not in forge_chain_name:
@@ -530,6 +646,11 @@ class ForgeFormatter:
     filename: str
     _format: Callable[[ForgeContext, ForgeResult], str]
 
+    @property
+    def format_fn(self) -> Callable[[ForgeContext, ForgeResult], str]:
+        """Render function, shared by formatters of the same format"""
+        return self._format
+
     def format(self, context: ForgeContext, result: ForgeResult) -> str:
         return self._format(context, result)
 
@@ -537,41 +658,84 @@ class ForgeFormatter:
         return self.filename
 
 
+REPORT_BEGIN = "====json-report-begin==="
+REPORT_END = "====json-report-end==="
+
+
+def find_line(text: str, line: str, start: int = 0) -> Tuple[int, int]:
+    """
+    Find the first line of text equal to `line` at or after offset `start`
+    Lines may end in "\n" or "\r\n"
+    Returns the offset of that line and the offset just past it, or (-1, -1)
+    """
+    while True:
+        index = text.find(line, start)
+        if index == -1:
+            return -1, -1
+        line_end = index + len(line)
+        if text.startswith("\r\n", line_end):
+            next_line = line_end + 2
+        elif line_end == len(text) or text[line_end] == "\n":
+            next_line = min(line_end + 1, len(text))
+        else:
+            next_line = -1
+        if (index == 0 or text[index - 1] == "\n") and next_line != -1:
+            return index, next_line
+        start = line_end
+
+
+def tail_lines(text: str, count: int) -> List[str]:
+    """
+    Equivalent to text.splitlines()[-count:] for "\n" and "\r\n" line endings,
+    without splitting every line
+    """
+    if not text:
+        return []
+    lines = text.rsplit("\n", count + 1)
+    if text.endswith("\n"):
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines[-count:]]
+
+
 def format_report(context: ForgeContext, result: ForgeResult) -> str:
-    report_lines = []
-    recording = False
-    error_buffer = []
+    output = result.output
     error_length = 10
-    for line in result.output.splitlines():
-        if line in ("====json-report-begin===", "====json-report-end==="):
-            recording = not recording
-        elif recording:
-            report_lines.append(line)
-        else:
-            if len(error_buffer) == error_length and not report_lines:
-                error_buffer.pop(0)
-            error_buffer.append(line)
-    report_output = "\n".join(report_lines)
-    error_output = "\n".join(error_buffer)
-    debugging_appendix = "Trailing Log Lines:\n{}\nDebugging output:\n{}".format(
-        error_output, result.debugging_output
-    )
-    if not report_lines:
-        return "Forge test runner terminated:\n{}".format(debugging_appendix)
+    error_buffer: Deque[str] = deque(maxlen=error_length)
+    report_begin, report_start = find_line(output, REPORT_BEGIN)
+    if report_begin == -1:
+        report_output = ""
+        error_buffer.extend(tail_lines(output, error_length))
+    else:
+        report_end, trailing_start = find_line(output, REPORT_END, report_start)
+        if report_end == -1:
+            report_end = trailing_start = len(output)
+        report_output = output[report_start:report_end]
+        if report_output.endswith("\n"):
+            report_output = report_output[:-1]
+        error_buffer.extend(tail_lines(output[:report_begin], error_length))
+        error_buffer.extend(tail_lines(output[trailing_start:], error_length))
+
+    def debugging_appendix() -> str:
+        return "Trailing Log Lines:\n{}\nDebugging output:\n{}".format(
+            "\n".join(error_buffer), result.debugging_output
+        )
+
+    if not report_output:
+        return "Forge test runner terminated:\n{}".format(debugging_appendix())
     report_text = None
     try:
-        report_text = json.loads(report_output).get("text")
+        report_text = json_loads(report_output).get("text")
     except Exception as e:
         return "Forge report malformed: {}\n{}\n{}".format(
-            e, repr(report_output), debugging_appendix
+            e, repr(report_output), debugging_appendix()
         )
     if not report_text:
         return "Forge report text empty. See test runner output.\n{}".format(
-            debugging_appendix
+            debugging_appendix()
         )
     else:
         if result.state == ForgeState.FAIL:
-            return "{}\n{}".format(report_text, debugging_appendix)
+            return "{}\n{}".format(report_text, debugging_appendix())
         return report_text
 
 
@@ -580,78 +744,35 @@ def get_validator_logs_link(
     forge_chain_name: str,
     time_filter: Union[bool, Tuple[datetime, datetime]],
 ) -> str:
-    es_base_url = (
-        DEVINFRA_ES_BASE_URL if "forge" in forge_chain_name else INTERN_ES_BASE_URL
-    )
-    es_default_index = (
-        DEVINFRA_ES_DEFAULT_INDEX
-        if "forge" in forge_chain_name
-        else INTERN_ES_DEFAULT_INDEX
-    )
-    val0_hostname = "aptos-node-0-validator-0"
+    if "forge" in forge_chain_name:
+        es_base_url, es_default_index = DEVINFRA_ES_BASE_URL, DEVINFRA_ES_DEFAULT_INDEX
+    else:
+        es_base_url, es_default_index = INTERN_ES_BASE_URL, INTERN_ES_DEFAULT_INDEX
 
     if time_filter is True:
         es_time_filter = (
             "refreshInterval:(pause:!f,value:10000),time:(from:now-15m,to:now)"
         )
     elif isinstance(time_filter, tuple):
-        es_start_time = time_filter[0].strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        es_end_time = time_filter[1].strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        es_start_time = get_utc_timestamp(time_filter[0])
+        es_end_time = get_utc_timestamp(time_filter[1])
         es_time_filter = f"refreshInterval:(pause:!t,value:0),time:(from:'{es_start_time}',to:'{es_end_time}')"
     else:
         raise Exception(f"Invalid refresh argument: {time_filter}")
 
-    return f"""
-        {es_base_url}/_dashboards/app/discover#/?
-        _g=(filters:!(), {es_time_filter})
-        &_a=(
-            columns:!(_source),
-            filters:!((
-                '$state':(store:appState),
-                meta:(
-                    alias:!n,
-                    disabled:!f,
-                    index:'{es_default_index}',
-                    key:chain_name,
-                    negate:!f,
-                    params:(query:{forge_chain_name}),
-                    type:phrase
-                ),
-                query:(match_phrase:(chain_name:{forge_chain_name}))
-            ),
-            (
-                '$state':(store:appState),
-                meta:(
-                    alias:!n,
-                    disabled:!f,
-                    index:'{es_default_index}',
-                    key:namespace,
-                    negate:!f,
-                    params:(query:{forge_namespace}),
-                    type:phrase
-                ),
-                query:(match_phrase:(namespace:{forge_namespace}))
-            ),
-            (
-                '$state':(store:appState),
-                meta:(
-                    alias:!n,
-                    disabled:!f,
-                    index:'{es_default_index}',
-                    key:hostname,
-                    negate:!f,
-                    params:(query:{val0_hostname}),
-                    type:phrase),
-                    query:(match_phrase:(hostname:{val0_hostname})
-                )
-            )),
-            index:'{es_default_index}',
-            interval:auto,query:(language:kuery,query:''),sort:!()
+    filters = ",".join(
+        ES_PHRASE_FILTER % {"index": es_default_index, "key": key, "value": value}
+        for key, value in (
+            ("chain_name", forge_chain_name),
+            ("namespace", forge_namespace),
+            ("hostname", VAL0_HOSTNAME),
         )
-    """.replace(
-        " ", ""
-    ).replace(
-        "\n", ""
+    )
+    return (
+        f"{es_base_url}/_dashboards/app/discover#/?"
+        f"_g=(filters:!(),{es_time_filter})"
+        f"&_a=(columns:!(_source),filters:!({filters}),index:'{es_default_index}',"
+        "interval:auto,query:(language:kuery,query:''),sort:!())"
     )
 
 
@@ -774,6 +895,10 @@ class ForgeRunner:
         raise NotImplementedError
 
 
+# Debugging queries are best effort, so bound how long they can hold up a run
+DEBUGGING_REQUEST_TIMEOUT = "30s"
+
+
 def dump_forge_state(shell: Shell, forge_namespace: str) -> str:
     try:
         return (
@@ -784,6 +909,7 @@ def dump_forge_state(shell: Shell, forge_namespace: str) -> str:
                     "pods",
                     "-n",
                     forge_namespace,
+                    f"--request-timeout={DEBUGGING_REQUEST_TIMEOUT}",
                 ]
             )
             .unwrap()
@@ -793,6 +919,27 @@ def dump_forge_state(shell: Shell, forge_namespace: str) -> str:
         return f"Failed to get debugging output: {e}"
 
 
+def get_forge_pod_status(shell: Shell, forge_pod_name: str) -> str:
+    # parse the pod status: https://kubernetes.io/docs/concepts/workloads/pods/pod-lifecycle/#pod-phase
+    return (
+        shell.run(
+            [
+                "kubectl",
+                "get",
+                "pod",
+                "-n",
+                "default",
+                forge_pod_name,
+                "-o",
+                "jsonpath={.status.phase}",
+            ]
+        )
+        .output.decode()
+        .strip()
+        .lower()
+    )
+
+
 def find_the_killer(shell: Shell, forge_namespace) -> str:
     killer = shell.run(
         [
@@ -803,6 +950,7 @@ def find_the_killer(shell: Shell, forge_namespace) -> str:
             f"forge-namespace={forge_namespace}",
             "-o",
             "jsonpath={.items[0].metadata.name}",
+            f"--request-timeout={DEBUGGING_REQUEST_TIMEOUT}",
         ]
     ).output.decode()
     return f"Likely killed by {killer}"
@@ -851,24 +999,59 @@ class LocalForgeRunner(ForgeRunner):
 
         # Kill port forward unless we're keeping them
         if not context.keep_args:
-            # Kill all processess with kubectl in the name
-            for process in context.processes.processes():
-                if (
-                    "kubectl" in process.name()
-                    and process.ppid() == context.processes.get_pid()
-                ):
-                    print("Killing", process)
-                    process.kill()
+            # Every other kubectl we run is waited on, so the port forward is
+            # the only one left running and can be killed directly
             port_forward_process.kill()
 
         return forge_result
 
 
+FORGE_RUNNER_TEMPLATE_PATH = "testsuite/forge-test-runner-template.yaml"
+# How long to wait for a running forge pod to complete
+FORGE_POD_COMPLETION_TIMEOUT = "24h"
+# Only the tail of the forge logs is needed to find the report
+MAX_FORGE_LOG_BYTES = MAX_STREAMED_OUTPUT_BYTES
+NOT_FOUND_REGEX = re.compile(r"not\s*found", re.IGNORECASE)
+# How many times to retry waiting on the forge pod after a transient failure
+FORGE_POD_COMPLETION_WAIT_ATTEMPTS = 3
+KUBECTL_WAIT_TIMED_OUT_REGEX = re.compile(r"timed out waiting for the condition")
+
+
+def kubectl_wait_timed_out(result: RunResult) -> bool:
+    return not result.succeeded() and bool(
+        KUBECTL_WAIT_TIMED_OUT_REGEX.search(result.output.decode(errors="replace"))
+    )
+
+
+def wait_for_forge_pod_completion(shell: Shell, forge_pod_name: str) -> RunResult:
+    """
+    Block until the forge pod stops being ready, retrying failures other than
+    timeouts a bounded number of times. Returns the last kubectl wait result
+    """
+    for _ in range(FORGE_POD_COMPLETION_WAIT_ATTEMPTS):
+        result = shell.run(
+            [
+                "kubectl",
+                "wait",
+                "-n",
+                "default",
+                f"--timeout={FORGE_POD_COMPLETION_TIMEOUT}",
+                "--for=condition=Ready=false",
+                f"pod/{forge_pod_name}",
+            ]
+        )
+        if result.succeeded() or kubectl_wait_timed_out(result):
+            break
+    return result
+
+
 class K8sForgeRunner(ForgeRunner):
     def run(self, context: ForgeContext) -> ForgeResult:
         forge_pod_name = sanitize_forge_resource_name(
             f"{context.forge_namespace}-{context.time.epoch()}-{context.image_tag}"
         )
+        # Deleting waits for the old pods to be gone, so the new pod sharing
+        # their label cannot be caught up in the deletion
         context.shell.run(
             [
                 "kubectl",
@@ -879,21 +1062,10 @@ class K8sForgeRunner(ForgeRunner):
                 "-l",
                 f"forge-namespace={context.forge_namespace}",
                 "--force",
+                "--wait",
             ]
         )
-        context.shell.run(
-            [
-                "kubectl",
-                "wait",
-                "-n",
-                "default",
-                "--for=delete",
-                "pod",
-                "-l",
-                f"forge-namespace={context.forge_namespace}",
-            ]
-        )
-        template = context.filesystem.read("testsuite/forge-test-runner-template.yaml")
+        template = context.filesystem.read(FORGE_RUNNER_TEMPLATE_PATH)
         forge_triggered_by = "github-actions" if context.github_actions else "other"
         rendered = template.decode().format(
             FORGE_POD_NAME=forge_pod_name,
@@ -905,26 +1077,23 @@ class K8sForgeRunner(ForgeRunner):
             AWS_ACCOUNT_NUM=context.aws_account_num,
             AWS_REGION=context.aws_region,
             FORGE_NAMESPACE=context.forge_namespace,
-            REUSE_ARGS=" ".join(context.reuse_args) if context.reuse_args else "",
-            KEEP_ARGS=" ".join(context.keep_args) if context.keep_args else "",
-            ENABLE_HAPROXY_ARGS=" ".join(context.haproxy_args)
-            if context.haproxy_args
-            else "",
-            NUM_VALIDATORS_ARGS=" ".join(context.num_validators_args)
-            if context.num_validators_args
-            else "",
-            NUM_VALIDATOR_FULLNODES_ARGS=" ".join(context.num_validator_fullnodes_args)
-            if context.num_validator_fullnodes_args
-            else "",
+            REUSE_ARGS=" ".join(context.reuse_args),
+            KEEP_ARGS=" ".join(context.keep_args),
+            ENABLE_HAPROXY_ARGS=" ".join(context.haproxy_args),
+            NUM_VALIDATORS_ARGS=" ".join(context.num_validators_args),
+            NUM_VALIDATOR_FULLNODES_ARGS=" ".join(context.num_validator_fullnodes_args),
             FORGE_TRIGGERED_BY=forge_triggered_by,
         )
 
         with ForgeResult.with_context(context) as forge_result:
             specfile = context.filesystem.mkstemp()
             context.filesystem.write(specfile, rendered.encode())
-            context.shell.run(
-                ["kubectl", "apply", "-n", "default", "-f", specfile]
-            ).unwrap()
+            try:
+                context.shell.run(
+                    ["kubectl", "apply", "-n", "default", "-f", specfile]
+                ).unwrap()
+            finally:
+                context.filesystem.unlink(specfile)
             context.shell.run(
                 [
                     "kubectl",
@@ -936,55 +1105,46 @@ class K8sForgeRunner(ForgeRunner):
                     f"pod/{forge_pod_name}",
                 ]
             ).unwrap()
-            state = None
-            attempts = 100
-            streaming = True
-            while state is None:
+            # The log stream ends once the forge container exits
+            forge_logs = context.shell.run(
+                ["kubectl", "logs", "-n", "default", "-f", forge_pod_name],
+                stream_output=True,
+                max_output_bytes=MAX_FORGE_LOG_BYTES,
+            )
+            forge_status = get_forge_pod_status(context.shell, forge_pod_name)
+
+            if forge_status == "running":
+                # The log stream was cut short, so block until the pod stops
+                # being ready rather than re-polling it, then fetch the logs again
+                forge_wait = wait_for_forge_pod_completion(
+                    context.shell, forge_pod_name
+                )
                 forge_logs = context.shell.run(
-                    ["kubectl", "logs", "-n", "default", "-f", forge_pod_name],
-                    stream_output=streaming,
+                    ["kubectl", "logs", "-n", "default", forge_pod_name],
+                    max_output_bytes=MAX_FORGE_LOG_BYTES,
                 )
+                forge_status = get_forge_pod_status(context.shell, forge_pod_name)
 
-                # After the first invocation, stop streaming duplicate logs
-                if streaming:
-                    streaming = False
-
-                if forge_logs.succeeded():
-                    forge_result.set_output(forge_logs.output.decode())
-
-                # parse the pod status: https://kubernetes.io/docs/concepts/workloads/pods/pod-lifecycle/#pod-phase
-                forge_status = (
-                    context.shell.run(
-                        [
-                            "kubectl",
-                            "get",
-                            "pod",
-                            "-n",
-                            "default",
-                            forge_pod_name,
-                            "-o",
-                            "jsonpath='{.status.phase}'",
-                        ]
-                    )
-                    .output.decode()
-                    .lower()
-                )
+            if forge_logs.succeeded():
+                forge_result.set_output(forge_logs.output.decode())
 
-                if "running" in forge_status:
-                    continue
-                elif "succeeded" in forge_status:
-                    state = ForgeState.PASS
-                elif re.findall(r"not\s*found", forge_status, re.IGNORECASE):
-                    state = ForgeState.SKIP
-                    forge_result.set_debugging_output(
-                        find_the_killer(context.shell, context.forge_namespace)
+            if forge_status == "running":
+                if kubectl_wait_timed_out(forge_wait):
+                    raise Exception("Timed out waiting for forge pod to complete")
+                raise Exception(
+                    "Forge pod still running after waiting for it: {}".format(
+                        forge_wait.output.decode(errors="replace")
                     )
-                else:
-                    state = ForgeState.FAIL
-
-                attempts -= 1
-                if attempts <= 0:
-                    raise Exception("Exhausted attempt to get forge pod status")
+                )
+            elif forge_status == "succeeded":
+                state = ForgeState.PASS
+            elif NOT_FOUND_REGEX.search(forge_status):
+                state = ForgeState.SKIP
+                forge_result.set_debugging_output(
+                    find_the_killer(context.shell, context.forge_namespace)
+                )
+            else:
+                state = ForgeState.FAIL
 
             forge_result.set_state(state)
 
@@ -995,25 +1155,44 @@ class AwsError(Exception):
     pass
 
 
+def parse_aws_token_expiration(aws_token_expiration: str) -> datetime:
+    """Parse a %Y-%m-%dT%H:%M:%S%z timestamp, preferring the faster fromisoformat"""
+    isoformat = aws_token_expiration
+    # Before python 3.11 fromisoformat needs a colon in the utc offset
+    if isoformat[-5:-4] in ("+", "-") and isoformat[-4:].isdigit():
+        isoformat = f"{isoformat[:-2]}:{isoformat[-2:]}"
+    try:
+        expiration = datetime.fromisoformat(isoformat)
+    except ValueError:
+        return datetime.strptime(aws_token_expiration, "%Y-%m-%dT%H:%M:%S%z")
+    if expiration.tzinfo is None:
+        raise ValueError(f"Missing utc offset: {aws_token_expiration}")
+    return expiration
+
+
 def assert_aws_token_expiration(aws_token_expiration: Optional[str]) -> None:
     if aws_token_expiration is None:
         raise AwsError("AWS token is required")
     try:
-        expiration = datetime.strptime(aws_token_expiration, "%Y-%m-%dT%H:%M:%S%z")
+        expiration = parse_aws_token_expiration(aws_token_expiration)
     except Exception as e:
         raise AwsError(f"Invalid date format: {aws_token_expiration}") from e
     if datetime.now(timezone.utc) > expiration:
         raise AwsError("AWS token has expired")
 
 
-def get_aws_account_num(shell: Shell) -> str:
-    caller_id = shell.run(["aws", "sts", "get-caller-identity"])
-    return json.loads(caller_id.unwrap()).get("Account")
-
-
-def assert_aws_auth(shell: Shell) -> None:
-    # Simple read command which should fail
-    list_eks_clusters(shell)
+async def aws_preflight(shell: Shell) -> Tuple[str, List[str]]:
+    """
+    Check AWS auth with concurrent reads, returning the account number and the
+    forge clusters so that later cluster selection need not list them again
+    """
+    cluster_result, caller_id = await asyncio.gather(
+        shell.gen_run(["aws", "eks", "list-clusters"]),
+        shell.gen_run(["aws", "sts", "get-caller-identity"]),
+    )
+    # Both are plain reads, so either failing means we are not authenticated
+    cluster_names = parse_eks_clusters(cluster_result.unwrap())
+    return json_loads(caller_id.unwrap()).get("Account"), cluster_names
 
 
 class ListClusterResult(TypedDict):
@@ -1022,9 +1201,13 @@ class ListClusterResult(TypedDict):
 
 def list_eks_clusters(shell: Shell) -> List[str]:
     cluster_json = shell.run(["aws", "eks", "list-clusters"]).unwrap()
+    return parse_eks_clusters(cluster_json)
+
+
+def parse_eks_clusters(cluster_json: bytes) -> List[str]:
     # This type annotation is not enforced, just helpful
     try:
-        cluster_result: ListClusterResult = json.loads(cluster_json)
+        cluster_result: ListClusterResult = json_loads(cluster_json)
         return [
             cluster_name
             for cluster_name in cluster_result["clusters"]
@@ -1034,45 +1217,146 @@ def list_eks_clusters(shell: Shell) -> List[str]:
         raise AwsError("Failed to list eks clusters") from e
 
 
-def set_current_cluster(shell: Shell, forge_cluster_name: str) -> None:
-    shell.run(
-        ["aws", "eks", "update-kubeconfig", "--name", forge_cluster_name]
+async def set_current_cluster(shell: Shell, forge_cluster_name: str) -> None:
+    (
+        await shell.gen_run(
+            ["aws", "eks", "update-kubeconfig", "--name", forge_cluster_name]
+        )
     ).unwrap()
 
 
-async def write_cluster_config(
-    shell: Shell, forge_cluster_name: str, temp: str
-) -> None:
-    (
+class DescribeClusterCertificateAuthority(TypedDict):
+    data: str
+
+
+class DescribeClusterInfo(TypedDict):
+    name: str
+    arn: str
+    endpoint: str
+    certificateAuthority: DescribeClusterCertificateAuthority
+
+
+class DescribeClusterResult(TypedDict):
+    cluster: DescribeClusterInfo
+
+
+async def describe_eks_cluster(
+    shell: Shell, forge_cluster_name: str
+) -> DescribeClusterInfo:
+    cluster_json = (
         await shell.gen_run(
             [
                 "aws",
                 "eks",
-                "update-kubeconfig",
+                "describe-cluster",
                 "--name",
                 forge_cluster_name,
-                "--kubeconfig",
-                temp,
+                "--output",
+                "json",
             ]
         )
     ).unwrap()
+    # This type annotation is not enforced, just helpful
+    try:
+        cluster_result: DescribeClusterResult = json_loads(cluster_json)
+        return cluster_result["cluster"]
+    except Exception as e:
+        raise AwsError(f"Failed to describe eks cluster {forge_cluster_name}") from e
+
+
+def render_kubeconfig(
+    clusters: Sequence[DescribeClusterInfo], aws_profile: Optional[str] = None
+) -> bytes:
+    """
+    Render a single kubeconfig with the entries aws eks update-kubeconfig would
+    write for each cluster, with one context per cluster named after its arn
+    """
+    kubeconfig: Dict[str, Any] = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [],
+        "contexts": [],
+        "users": [],
+    }
+    exec_env = None
+    if aws_profile:
+        # Token requests must use the same profile the cluster was described with
+        exec_env = [{"name": "AWS_PROFILE", "value": aws_profile}]
+    for cluster in clusters:
+        arn = cluster["arn"]
+        # arn:aws:eks:<region>:<account>:cluster/<name>
+        region = arn.split(":")[3]
+        kubeconfig["clusters"].append(
+            {
+                "name": arn,
+                "cluster": {
+                    "server": cluster["endpoint"],
+                    "certificate-authority-data": cluster["certificateAuthority"][
+                        "data"
+                    ],
+                },
+            }
+        )
+        kubeconfig["contexts"].append(
+            {"name": arn, "context": {"cluster": arn, "user": arn}}
+        )
+        kubeconfig["users"].append(
+            {
+                "name": arn,
+                "user": {
+                    "exec": {
+                        "apiVersion": "client.authentication.k8s.io/v1beta1",
+                        "command": "aws",
+                        "args": [
+                            "--region",
+                            region,
+                            "eks",
+                            "get-token",
+                            "--cluster-name",
+                            cluster["name"],
+                            # Tokens must be json whatever the configured output
+                            "--output",
+                            "json",
+                        ],
+                        "env": exec_env,
+                    }
+                },
+            }
+        )
+    # JSON is valid YAML, so kubectl reads this like any other kubeconfig
+    return json.dumps(kubeconfig).encode()
+
+
+async def write_cluster_config(
+    shell: Shell, filesystem: Filesystem, forge_cluster_names: List[str], temp: str
+) -> List[DescribeClusterInfo]:
+    # Rendering the kubeconfig here leaves describe-cluster as the only aws
+    # request, rather than update-kubeconfig reading and merging the file
+    clusters = await asyncio.gather(
+        *(describe_eks_cluster(shell, name) for name in forge_cluster_names)
+    )
+    filesystem.write(temp, render_kubeconfig(clusters, os.getenv("AWS_PROFILE")))
+    return clusters
 
 
 def update_aws_auth(shell: Shell, aws_auth_script: Optional[str] = None) -> None:
     if aws_auth_script is None:
         raise AwsError("Please authenticate with AWS and rerun")
-    result = shell.run(["bash", "-c", f"source {aws_auth_script} && env | grep AWS_"])
-    for line in result.unwrap().decode().splitlines():
-        if line.startswith("AWS_"):
-            key, val = line.split("=", 1)
+    # NUL separated entries survive values which contain newlines
+    result = shell.run(["bash", "-c", f"source {aws_auth_script} && env -0"])
+    for entry in result.unwrap().decode().split("\0"):
+        if entry.startswith("AWS_"):
+            key, val = entry.split("=", 1)
             os.environ[key] = val
-    assert_aws_auth(shell)
+
+
+APTOS_CLUSTER_REGEX = re.compile(r"aptos.*")
 
 
 def get_current_cluster_name(shell: Shell) -> str:
     result = shell.run(["kubectl", "config", "current-context"])
     current_context = result.unwrap().decode()
-    matches = re.findall(r"aptos.*", current_context)
+    matches = APTOS_CLUSTER_REGEX.findall(current_context)
     if len(matches) != 1:
         raise ValueError("Could not determine current cluster name: {current_context}")
     return matches[0]
@@ -1085,12 +1369,15 @@ class Git:
     def run(self, command) -> RunResult:
         return self.shell.run(["git", *command])
 
-    def last(self, limit: int = 1) -> Generator[str, None, None]:
-        for i in range(limit):
-            yield self.run(["rev-parse", f"HEAD~{i}"]).unwrap().decode().strip()
+    def last(self, limit: int = 1) -> List[str]:
+        if limit <= 0:
+            return []
+        # A single rev-list walks the history once instead of forking git per commit
+        result = self.run(["rev-list", "--max-count", str(limit), "HEAD"])
+        return result.unwrap().decode().splitlines()
 
 
-def find_recent_images_by_profile_or_features(
+async def find_recent_images_by_profile_or_features(
     shell: Shell,
     git: Git,
     num_images: int,
@@ -1109,7 +1396,7 @@ def find_recent_images_by_profile_or_features(
     if enable_failpoints_feature:
         image_tag_prefix = "failpoints_"
 
-    return find_recent_images(
+    return await find_recent_images(
         shell,
         git,
         num_images,
@@ -1119,7 +1406,7 @@ def find_recent_images_by_profile_or_features(
     )
 
 
-def find_recent_images(
+async def find_recent_images(
     shell: Shell,
     git: Git,
     num_images: int,
@@ -1127,53 +1414,90 @@ def find_recent_images(
     commit_threshold: int = 100,
     image_name: str = "aptos/validator",
     image_tag_prefix: str = "",
-) -> Generator[str, None, None]:
+) -> List[str]:
     """
     Find the last `num_images` images built from the current git repo by searching the git commit history
     For images built with different features or profiles than the default release profile, the image searching logic
     will be more complicated. We use a combination of image_tag prefixes and different image names to distinguish
     """
 
-    i = 0
-    for revision in git.last(commit_threshold):
-        image_tag = f"{image_tag_prefix}{revision}"
-        exists = image_exists(shell, image_name, image_tag)
-        if exists:
-            i += 1
-            yield image_tag
-        if i >= num_images:
-            break
-    if i < num_images:
-        raise Exception(f"Could not find {num_images} recent images")
+    image_tags = [
+        f"{image_tag_prefix}{revision}" for revision in git.last(commit_threshold)
+    ]
+    found_tags = []
+    # Check the tags a batch at a time, stopping once we have found enough
+    for start in range(0, len(image_tags), ECR_MAX_IMAGE_IDS):
+        batch = image_tags[start : start + ECR_MAX_IMAGE_IDS]
+        existing_tags = await images_exist(shell, image_name, batch)
+        for image_tag in batch:
+            if image_tag in existing_tags:
+                found_tags.append(image_tag)
+            if len(found_tags) >= num_images:
+                return found_tags
+    raise Exception(f"Could not find {num_images} recent images")
+
+
+async def prepare_forge_cluster(
+    shell: Shell,
+    git: Git,
+    forge_cluster_name: str,
+    num_images: int,
+    enable_failpoints_feature: bool = False,
+    enable_performance_profile: bool = False,
+) -> List[str]:
+    """Point kubectl at the forge cluster while looking up the recent images"""
+    _, image_tags = await asyncio.gather(
+        set_current_cluster(shell, forge_cluster_name),
+        find_recent_images_by_profile_or_features(
+            shell,
+            git,
+            num_images,
+            enable_failpoints_feature=enable_failpoints_feature,
+            enable_performance_profile=enable_performance_profile,
+        ),
+    )
+    return image_tags
+
+
+# The most image ids ECR accepts in a single request
+ECR_MAX_IMAGE_IDS = 100
 
 
-def image_exists(shell: Shell, image_name: str, image_tag: str) -> bool:
-    result = shell.run(
+async def images_exist(
+    shell: Shell, image_name: str, image_tags: List[str]
+) -> Set[str]:
+    """Find which of up to ECR_MAX_IMAGE_IDS image tags exist in a single request"""
+    assert len(image_tags) <= ECR_MAX_IMAGE_IDS, "Too many image tags to check"
+    # Unlike describe-images, batch-get-image reports missing tags as failures
+    # instead of failing the whole request
+    result = await shell.gen_run(
         [
             "aws",
             "ecr",
-            "describe-images",
+            "batch-get-image",
             "--repository-name",
-            f"{image_name}",
+            image_name,
             "--image-ids",
-            f"imageTag={image_tag}",
+            *[f"imageTag={image_tag}" for image_tag in image_tags],
+            "--query",
+            "images[].imageId.imageTag",
+            "--output",
+            "text",
         ]
     )
-    return result.exit_code == 0
+    return set(result.unwrap().decode().split())
+
+
+# Kubernetes resource names only allow ascii alphanumerics and dashes
+INVALID_RESOURCE_CHARS_REGEX = re.compile(r"[^A-Za-z0-9]")
+MAX_RESOURCE_NAME_LENGTH = 64
 
 
 def sanitize_forge_resource_name(forge_resource: str) -> str:
     """Sanitize the intended forge resource name to be a valid k8s resource name"""
-    max_length = 64
-    sanitized_namespace = ""
-    for i, c in enumerate(forge_resource):
-        if i >= max_length:
-            break
-        if c.isalnum():
-            sanitized_namespace += c
-        else:
-            sanitized_namespace += "-"
-    return sanitized_namespace
+    return INVALID_RESOURCE_CHARS_REGEX.sub(
+        "-", forge_resource[:MAX_RESOURCE_NAME_LENGTH]
+    )
 
 
 @main.command()
@@ -1258,16 +1582,16 @@ def test(
     processes = FakeProcesses() if dry_run else SystemProcesses()
     time = FakeTime() if dry_run else SystemTime()
 
+    cluster_names: Optional[List[str]] = None
     if dry_run:
         aws_account_num = "1234"
     # Pre flight checks
     else:
         try:
-            assert_aws_auth(shell)
-            aws_account_num = get_aws_account_num(shell)
+            aws_account_num, cluster_names = asyncio.run(aws_preflight(shell))
         except Exception:
             update_aws_auth(shell, aws_auth_script)
-            aws_account_num = get_aws_account_num(shell)
+            aws_account_num, cluster_names = asyncio.run(aws_preflight(shell))
 
     if aws_auth_script and aws_token_expiration and not dry_run:
         assert_aws_token_expiration(
@@ -1285,7 +1609,9 @@ def test(
                 forge_cluster_name = current_cluster
 
     if not forge_cluster_name or balance_clusters:
-        cluster_names = list_eks_clusters(shell)
+        # Reuse the clusters already listed by the pre flight checks
+        if cluster_names is None:
+            cluster_names = list_eks_clusters(shell)
         forge_cluster_name = random.choice(cluster_names)
 
     assert forge_cluster_name, "Forge cluster name is required"
@@ -1300,46 +1626,43 @@ def test(
         else:
             return
 
-    set_current_cluster(shell, forge_cluster_name)
-
-    if forge_namespace is None:
-        forge_namespace = f"forge-{get_current_user()}-{time.epoch()}"
-
-    forge_namespace = sanitize_forge_resource_name(forge_namespace)
-
-    assert forge_namespace is not None, "Forge namespace is required"
-
     # These features and profile flags are set as strings
     forge_enable_failpoints = forge_enable_failpoints == "true"
     forge_enable_performance = forge_enable_performance == "true"
 
-    if forge_test_suite == "compat":
-        # Compat uses 2 image tags
-        default_latest_image, second_latest_image = list(
-            find_recent_images_by_profile_or_features(
+    # Compat uses 2 image tags, all other tests use just one image tag
+    num_images = 2 if forge_test_suite == "compat" else 1
+    if dry_run:
+        # Nothing real runs in a dry run, so skip searching for recent images
+        asyncio.run(set_current_cluster(shell, forge_cluster_name))
+        recent_images = ["dryrun"] * num_images
+    else:
+        recent_images = asyncio.run(
+            prepare_forge_cluster(
                 shell,
                 git,
-                2,
+                forge_cluster_name,
+                num_images,
                 enable_failpoints_feature=forge_enable_failpoints,
                 enable_performance_profile=forge_enable_performance,
             )
         )
+
+    if forge_namespace is None:
+        forge_namespace = f"forge-{get_current_user()}-{time.epoch()}"
+
+    forge_namespace = sanitize_forge_resource_name(forge_namespace)
+
+    assert forge_namespace is not None, "Forge namespace is required"
+
+    if forge_test_suite == "compat":
+        default_latest_image, second_latest_image = recent_images
         # This might not work as intended because we dont know if that revision passed forge
         image_tag = image_tag or second_latest_image
         forge_image_tag = forge_image_tag or default_latest_image
         upgrade_image_tag = upgrade_image_tag or default_latest_image
     else:
-        # All other tests use just one image tag
-        # Only try finding exactly 1 image
-        default_latest_image = list(
-            find_recent_images_by_profile_or_features(
-                shell,
-                git,
-                1,
-                enable_failpoints_feature=forge_enable_failpoints,
-                enable_performance_profile=forge_enable_performance,
-            )
-        )[0]
+        default_latest_image = recent_images[0]
         image_tag = image_tag or default_latest_image
         forge_image_tag = forge_image_tag or default_latest_image
         upgrade_image_tag = upgrade_image_tag or default_latest_image
@@ -1433,46 +1756,21 @@ class ForgeJob:
     phase: str
     cluster: ForgeCluster
 
-    @classmethod
-    def from_pod(cls, cluster: ForgeCluster, pod: GetPodsItem) -> ForgeJob:
-        return cls(
-            name=pod["metadata"]["name"], phase=pod["status"]["phase"], cluster=cluster
-        )
-
-    def running(self):
-        return self.phase == "Running"
-
-    def succeeded(self):
-        return self.phase == "Succeeded"
-
-    def failed(self):
-        return self.phase == "Failed"
-
-
-class GetPodsItemMetadata(TypedDict):
-    name: str
-
-
-class GetPodsItemStatus(TypedDict):
-    phase: str
-
-
-class GetPodsItem(TypedDict):
-    metadata: GetPodsItemMetadata
-    status: GetPodsItemStatus
 
-
-class GetPodsResult(TypedDict):
-    items: List[GetPodsItem]
+# Label applied to forge runner pods by forge-test-runner-template.yaml
+FORGE_POD_SELECTOR = "app.kubernetes.io/name=forge"
+# Only fetch the pod fields we need, as one "<name>\t<phase>" line per pod
+GET_PODS_JSONPATH = (
+    r'jsonpath={range .items[*]}{.metadata.name}{"\t"}{.status.phase}{"\n"}{end}'
+)
 
 
 @dataclass
 class ForgeCluster:
     name: str
     kubeconf: str
-
-    async def write(self, shell: Shell) -> None:
-        await write_cluster_config(shell, self.name, self.kubeconf)
+    # All clusters share one kubeconfig, each under its own context
+    context: str
 
     async def get_jobs(self, shell: Shell) -> List[ForgeJob]:
         pod_result = (
@@ -1486,42 +1784,57 @@ class ForgeCluster:
                         "default",
                         "--kubeconfig",
                         self.kubeconf,
+                        "--context",
+                        self.context,
+                        "-l",
+                        FORGE_POD_SELECTOR,
                         "-o",
-                        "json",
+                        GET_PODS_JSONPATH,
                     ]
                 )
             )
             .unwrap()
             .decode()
         )
-        pods_result: GetPodsResult = json.loads(pod_result)
-        pods = pods_result["items"]
-        return [
-            ForgeJob.from_pod(self, pod)
-            for pod in pods
-            if pod["metadata"]["name"].startswith("forge-")
-        ]
+        jobs = []
+        for line in pod_result.splitlines():
+            name, phase = line.split("\t", 1)
+            jobs.append(ForgeJob(name=name, phase=phase, cluster=self))
+        return jobs
 
 
 async def get_all_forge_jobs(context: SystemContext) -> List[ForgeJob]:
     # Get all cluster contexts
-    all_jobs = []
-    tempfiles = []
-    for cluster in list_eks_clusters(context.shell):
-        temp = context.filesystem.mkstemp()
-        tempfiles.append(temp)
-        config = ForgeCluster(name=cluster, kubeconf=temp)
-        await config.write(context.shell)
-        all_jobs.extend(await config.get_jobs(context.shell))
+    kubeconf = context.filesystem.mkstemp()
 
-    def unlink_tempfiles():
-        for temp in tempfiles:
-            context.filesystem.unlink(temp)
+    def unlink_tempfile():
+        context.filesystem.unlink(kubeconf)
 
-    # Delay the deletion of cluster files till the process terminates
-    context.processes.atexit(unlink_tempfiles)
+    # Delay the deletion of the cluster file till the process terminates
+    context.processes.atexit(unlink_tempfile)
+
+    cluster_infos = await write_cluster_config(
+        context.shell,
+        context.filesystem,
+        list_eks_clusters(context.shell),
+        kubeconf,
+    )
+    clusters = [
+        ForgeCluster(name=info["name"], kubeconf=kubeconf, context=info["arn"])
+        for info in cluster_infos
+    ]
+    # Each cluster only waits on its own kubectl call
+    cluster_jobs = await asyncio.gather(
+        *(cluster.get_jobs(context.shell) for cluster in clusters)
+    )
+    return [job for jobs in cluster_jobs for job in jobs]
 
-    return all_jobs
+
+JOB_PHASE_COLORS = {
+    "Succeeded": "green",
+    "Failed": "red",
+    "Running": "yellow",
+}
 
 
 @main.command("list-jobs")
@@ -1538,23 +1851,18 @@ def list_jobs(
     context = SystemContext(shell, filesystem, processes)
 
     # Default to show running jobs
-    phase = phase or ["Running"]
+    phases = frozenset(phase or ["Running"])
 
-    pattern = re.compile(regex or ".*")
+    # Compile once up front, and skip matching entirely without a regex
+    pattern = re.compile(regex) if regex else None
     jobs = asyncio.run(get_all_forge_jobs(context))
 
     for job in jobs:
-        if not pattern.match(job.name) or phase and job.phase not in phase:
+        if pattern and not pattern.match(job.name):
             continue
-        if job.succeeded():
-            fg = "green"
-        elif job.failed():
-            fg = "red"
-        elif job.running():
-            fg = "yellow"
-        else:
-            fg = "white"
-
+        if job.phase not in phases:
+            continue
+        fg = JOB_PHASE_COLORS.get(job.phase, "white")
         click.secho(f"{job.cluster.name} {job.name} {job.phase}", fg=fg)
 
 
@@ -1581,18 +1889,19 @@ def tail(
     elif len(found_jobs) > 1:
         raise Exception(f"Found multiple jobs for name {job_name}")
     job = found_jobs[0]
-    shell.run(
+    shell.run_attached(
         [
             "kubectl",
             "logs",
             "--kubeconfig",
             job.cluster.kubeconf,
+            "--context",
+            job.cluster.context,
             "-n",
             "default",
             "-f",
             job_name,
-        ],
-        stream_output=True,
+        ]
     ).unwrap()
 
 
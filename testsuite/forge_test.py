@@ -1,31 +1,34 @@
 from distutils.ccompiler import get_default_compiler
+import asyncio
 import json
 import os
 import unittest
 import tempfile
 from collections import OrderedDict
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Protocol, Sequence, Union
+from unittest.mock import patch
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple, Union
 
 from click.testing import CliRunner
 from .forge import (
+    GET_PODS_JSONPATH,
     AwsError,
+    DescribeClusterCertificateAuthority,
+    DescribeClusterInfo,
+    DescribeClusterResult,
     FakeTime,
     ForgeCluster,
     ForgeFormatter,
     ForgeJob,
     ForgeResult,
     ForgeState,
-    GetPodsItem,
-    GetPodsItemMetadata,
-    GetPodsItemStatus,
-    GetPodsResult,
     Git,
     K8sForgeRunner,
     ListClusterResult,
     SystemContext,
     assert_aws_token_expiration,
+    aws_preflight,
     find_recent_images_by_profile_or_features,
     format_comment,
     format_pre_comment,
@@ -35,14 +38,17 @@ from .forge import (
     get_humio_logs_link,
     get_validator_logs_link,
     list_eks_clusters,
+    render_kubeconfig,
     main,
     ForgeContext,
     LocalForgeRunner,
     FakeShell,
     FakeFilesystem,
     RunResult,
+    RingBuffer,
     FakeProcesses,
     sanitize_forge_resource_name,
+    update_aws_auth,
 )
 
 
@@ -85,14 +91,21 @@ class AssertFixtureMixin:
 class SpyShell(FakeShell):
     def __init__(
         self,
-        command_map: Dict[str, Union[RunResult, Exception]],
+        command_map: Dict[
+            str, Union[RunResult, Exception, List[Union[RunResult, Exception]]]
+        ],
         strict: bool = False,
     ) -> None:
         self.command_map = command_map
         self.commands = []
         self.strict = strict
 
-    def run(self, command: Sequence[str], stream_output: bool = False) -> RunResult:
+    def run(
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
+    ) -> RunResult:
         rendered_command = " ".join(command)
         default = (
             Exception(f"Command not mocked: {rendered_command}")
@@ -100,15 +113,25 @@ class SpyShell(FakeShell):
             else super().run(command)
         )
         result = self.command_map.get(rendered_command, default)
+        if isinstance(result, list):
+            # Repeated commands take successive results, then keep the last one
+            calls = self.commands.count(rendered_command)
+            result = result[min(calls, len(result) - 1)]
         self.commands.append(rendered_command)
         if isinstance(result, Exception):
             raise result
         return result
 
     async def gen_run(
-        self, command: Sequence[str], stream_output: bool = False
+        self,
+        command: Sequence[str],
+        stream_output: bool = False,
+        max_output_bytes: Optional[int] = None,
     ) -> RunResult:
-        return self.run(command, stream_output)
+        return self.run(command, stream_output, max_output_bytes)
+
+    def run_attached(self, command: Sequence[str]) -> RunResult:
+        return self.run(command)
 
     def assert_commands(self, testcase) -> None:
         testcase.assertEqual(list(self.command_map.keys()), self.commands)
@@ -207,7 +230,6 @@ class ForgeRunnerTests(unittest.TestCase):
                         "cargo run -p forge-cli -- --suite banana --duration-secs 123 test k8s-swarm --image-tag asdf --upgrade-image-tag upgrade_asdf --namespace potato --port-forward",
                         RunResult(0, b"orange"),
                     ),
-                    ("kubectl get pods -n potato", RunResult(0, b"Pods")),
                 ]
             )
         )
@@ -217,6 +239,10 @@ class ForgeRunnerTests(unittest.TestCase):
         result = runner.run(context)
         self.assertEqual(result.state, ForgeState.PASS, result.output)
         shell.assert_commands(self)
+        self.assertEqual(result.debugging_output, "output")
+        self.assertEqual(
+            shell.commands[-1], "kubectl get pods -n potato --request-timeout=30s"
+        )
         filesystem.assert_writes(self)
         filesystem.assert_reads(self)
 
@@ -226,27 +252,22 @@ class ForgeRunnerTests(unittest.TestCase):
             OrderedDict(
                 [
                     (
-                        "kubectl delete pod -n default -l forge-namespace=potato --force",
-                        RunResult(0, b""),
-                    ),
-                    (
-                        "kubectl wait -n default --for=delete pod -l forge-namespace=potato",
+                        "kubectl delete pod -n default -l forge-namespace=potato --force --wait",
                         RunResult(0, b""),
                     ),
                     ("kubectl apply -n default -f temp1", RunResult(0, b"")),
                     (
-                        "kubectl wait -n default --timeout=5m --for=condition=Ready pod/potato-1659078000-asdf",
+                        "kubectl wait -n default --timeout=5m --for=condition=Ready pod/potato-1659052800-asdf",
                         RunResult(0, b""),
                     ),
                     (
-                        "kubectl logs -n default -f potato-1659078000-asdf",
+                        "kubectl logs -n default -f potato-1659052800-asdf",
                         RunResult(0, b""),
                     ),
                     (
-                        "kubectl get pod -n default potato-1659078000-asdf -o jsonpath='{.status.phase}'",
+                        "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
                         RunResult(0, b"Succeeded"),
                     ),
-                    ("kubectl get pods -n potato", RunResult(0, b"Pods")),
                 ]
             )
         )
@@ -259,6 +280,7 @@ class ForgeRunnerTests(unittest.TestCase):
             {
                 "testsuite/forge-test-runner-template.yaml": forge_yaml.read_bytes(),
             },
+            ["temp1"],
         )
         context = fake_context(shell, filesystem)
         runner = K8sForgeRunner()
@@ -266,8 +288,184 @@ class ForgeRunnerTests(unittest.TestCase):
         shell.assert_commands(self)
         filesystem.assert_writes(self)
         filesystem.assert_reads(self)
+        filesystem.assert_unlinks(self)
         self.assertEqual(result.state, ForgeState.PASS, result.output)
 
+    def testK8sRunnerLogStreamInterrupted(self) -> None:
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "kubectl logs -n default -f potato-1659052800-asdf",
+                        RunResult(1, b"connection reset"),
+                    ),
+                    (
+                        "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                        [RunResult(0, b"Running"), RunResult(0, b"Succeeded")],
+                    ),
+                    (
+                        "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                        RunResult(0, b""),
+                    ),
+                    (
+                        "kubectl logs -n default potato-1659052800-asdf",
+                        RunResult(0, b"orange"),
+                    ),
+                ]
+            )
+        )
+        context = fake_context(shell)
+        runner = K8sForgeRunner()
+        result = runner.run(context)
+        self.assertEqual(result.state, ForgeState.PASS, result.debugging_output)
+        self.assertEqual(result.output, "orange")
+        self.assertEqual(
+            [command for command in shell.commands if command in shell.command_map],
+            [
+                "kubectl logs -n default -f potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                "kubectl logs -n default potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+            ],
+        )
+
+    def testK8sRunnerTimesOutWaitingForPod(self) -> None:
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "kubectl logs -n default -f potato-1659052800-asdf",
+                        RunResult(1, b"connection reset"),
+                    ),
+                    (
+                        "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                        RunResult(0, b"Running"),
+                    ),
+                    (
+                        "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                        RunResult(
+                            1,
+                            b"error: timed out waiting for the condition on pods/potato-1659052800-asdf",
+                        ),
+                    ),
+                    (
+                        "kubectl logs -n default potato-1659052800-asdf",
+                        RunResult(0, b"orange"),
+                    ),
+                ]
+            )
+        )
+        context = fake_context(shell)
+        runner = K8sForgeRunner()
+        result = runner.run(context)
+        self.assertEqual(result.state, ForgeState.FAIL)
+        self.assertEqual(result.output, "orange")
+        self.assertIn("Timed out waiting for forge pod", result.debugging_output)
+        self.assertEqual(
+            [command for command in shell.commands if command in shell.command_map],
+            [
+                "kubectl logs -n default -f potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                "kubectl logs -n default potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+            ],
+        )
+
+    def testK8sRunnerRetriesPodCompletionWait(self) -> None:
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "kubectl logs -n default -f potato-1659052800-asdf",
+                        RunResult(1, b"connection reset"),
+                    ),
+                    (
+                        "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                        [RunResult(0, b"Running"), RunResult(0, b"Succeeded")],
+                    ),
+                    (
+                        "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                        [RunResult(1, b"error: unexpected EOF"), RunResult(0, b"")],
+                    ),
+                    (
+                        "kubectl logs -n default potato-1659052800-asdf",
+                        RunResult(0, b"orange"),
+                    ),
+                ]
+            )
+        )
+        context = fake_context(shell)
+        runner = K8sForgeRunner()
+        result = runner.run(context)
+        self.assertEqual(result.state, ForgeState.PASS, result.debugging_output)
+        self.assertEqual(result.output, "orange")
+        self.assertEqual(
+            [command for command in shell.commands if command in shell.command_map],
+            [
+                "kubectl logs -n default -f potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                "kubectl logs -n default potato-1659052800-asdf",
+                "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+            ],
+        )
+
+    def testK8sRunnerGivesUpWaitingForPod(self) -> None:
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "kubectl logs -n default -f potato-1659052800-asdf",
+                        RunResult(1, b"connection reset"),
+                    ),
+                    (
+                        "kubectl get pod -n default potato-1659052800-asdf -o jsonpath={.status.phase}",
+                        RunResult(0, b"Running"),
+                    ),
+                    (
+                        "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf",
+                        RunResult(1, b"error: unexpected EOF"),
+                    ),
+                ]
+            )
+        )
+        context = fake_context(shell)
+        runner = K8sForgeRunner()
+        result = runner.run(context)
+        self.assertEqual(result.state, ForgeState.FAIL)
+        self.assertIn("unexpected EOF", result.debugging_output)
+        self.assertNotIn("Timed out", result.debugging_output)
+        self.assertEqual(
+            shell.commands.count(
+                "kubectl wait -n default --timeout=24h --for=condition=Ready=false pod/potato-1659052800-asdf"
+            ),
+            3,
+        )
+
+
+class TestRingBuffer(unittest.TestCase):
+    def testUnbounded(self) -> None:
+        buffer = RingBuffer()
+        for chunk in (b"banana\n", b"apple\n", b"potato\n"):
+            buffer.append(chunk)
+        self.assertEqual(buffer.getvalue(), b"banana\napple\npotato\n")
+
+    def testKeepsTrailingLines(self) -> None:
+        buffer = RingBuffer(10)
+        for chunk in (b"banana\n", b"apple\n", b"potato\n"):
+            buffer.append(chunk)
+        self.assertEqual(buffer.getvalue(), b"potato\n")
+        self.assertLessEqual(len(buffer.chunks), 2)
+
+    def testKeepsWholeCharacters(self) -> None:
+        buffer = RingBuffer(9)
+        for chunk in (("\u00e9" * 8).encode(), ("\u00e9" * 8).encode()):
+            buffer.append(chunk)
+        self.assertEqual(buffer.getvalue().decode(), "\u00e9" * 4)
+
 
 class TestAWSTokenExpiration(unittest.TestCase):
     def testNoAwsToken(self) -> None:
@@ -279,6 +477,15 @@ class TestAWSTokenExpiration(unittest.TestCase):
         with self.assertRaisesRegex(AwsError, "AWS token has expired"):
             assert_aws_token_expiration(expiration)
 
+    def testAwsTokenValid(self) -> None:
+        expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+        assert_aws_token_expiration(expiration.strftime("%Y-%m-%dT%H:%M:%S%z"))
+        assert_aws_token_expiration(expiration.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+    def testAwsTokenMissingOffset(self) -> None:
+        with self.assertRaisesRegex(AwsError, "Invalid date format:.*"):
+            assert_aws_token_expiration("2100-01-01T00:00:00")
+
     def testAwsTokenMalformed(self) -> None:
         with self.assertRaisesRegex(AwsError, "Invalid date format:.*"):
             assert_aws_token_expiration("asdlkfjasdlkjf")
@@ -289,89 +496,132 @@ class TestFindRecentImage(unittest.TestCase):
         shell = SpyShell(
             OrderedDict(
                 [
-                    ("git rev-parse HEAD~0", RunResult(0, b"potato\n")),
                     (
-                        "aws ecr describe-images --repository-name aptos/validator --image-ids imageTag=potato",
-                        RunResult(1, b""),
+                        "git rev-list --max-count 2 HEAD",
+                        RunResult(0, b"potato\nlychee\n"),
                     ),
-                    ("git rev-parse HEAD~1", RunResult(0, b"lychee\n")),
                     (
-                        "aws ecr describe-images --repository-name aptos/validator --image-ids imageTag=lychee",
-                        RunResult(0, b""),
+                        "aws ecr batch-get-image --repository-name aptos/validator --image-ids imageTag=potato imageTag=lychee --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"lychee\n"),
+                    ),
+                ]
+            )
+        )
+        git = Git(shell)
+        image_tags = asyncio.run(
+            find_recent_images_by_profile_or_features(shell, git, 1, commit_threshold=2)
+        )
+        self.assertEqual(image_tags, ["lychee"])
+        shell.assert_commands(self)
+
+    def testFindRecentImagesInBatches(self) -> None:
+        revisions = [f"rev{i}" for i in range(150)]
+        first_batch = " ".join(f"imageTag={revision}" for revision in revisions[:100])
+        second_batch = " ".join(f"imageTag={revision}" for revision in revisions[100:])
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "git rev-list --max-count 150 HEAD",
+                        RunResult(0, "".join(f"{r}\n" for r in revisions).encode()),
+                    ),
+                    (
+                        f"aws ecr batch-get-image --repository-name aptos/validator --image-ids {first_batch} --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"rev42\n"),
+                    ),
+                    (
+                        f"aws ecr batch-get-image --repository-name aptos/validator --image-ids {second_batch} --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"rev120\trev101\n"),
                     ),
                 ]
             )
         )
         git = Git(shell)
-        image_tags = find_recent_images_by_profile_or_features(shell, git, 1)
-        self.assertEqual(list(image_tags), ["lychee"])
+        image_tags = asyncio.run(
+            find_recent_images_by_profile_or_features(
+                shell, git, 2, commit_threshold=150
+            )
+        )
+        self.assertEqual(image_tags, ["rev42", "rev101"])
+        shell.assert_commands(self)
+
+    def testGitLastNothing(self) -> None:
+        shell = SpyShell(OrderedDict())
+        git = Git(shell)
+        self.assertEqual(git.last(0), [])
         shell.assert_commands(self)
 
     def testFindRecentFailpointsImage(self) -> None:
         shell = SpyShell(
             OrderedDict(
                 [
-                    ("git rev-parse HEAD~0", RunResult(0, b"tomato\n")),
+                    ("git rev-list --max-count 1 HEAD", RunResult(0, b"tomato\n")),
                     (
-                        "aws ecr describe-images --repository-name aptos/validator --image-ids imageTag=failpoints_tomato",
-                        RunResult(0, b""),
+                        "aws ecr batch-get-image --repository-name aptos/validator --image-ids imageTag=failpoints_tomato --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"failpoints_tomato\n"),
                     ),
                 ]
             )
         )
         git = Git(shell)
-        image_tags = find_recent_images_by_profile_or_features(
-            shell, git, 1, enable_failpoints_feature=True
+        image_tags = asyncio.run(
+            find_recent_images_by_profile_or_features(
+                shell, git, 1, commit_threshold=1, enable_failpoints_feature=True
+            )
         )
-        self.assertEqual(list(image_tags), ["failpoints_tomato"])
+        self.assertEqual(image_tags, ["failpoints_tomato"])
         shell.assert_commands(self)
 
     def testFindRecentPerformanceImage(self) -> None:
         shell = SpyShell(
             OrderedDict(
                 [
-                    ("git rev-parse HEAD~0", RunResult(0, b"potato\n")),
+                    ("git rev-list --max-count 1 HEAD", RunResult(0, b"potato\n")),
                     (
-                        "aws ecr describe-images --repository-name aptos/validator --image-ids imageTag=performance_potato",
-                        RunResult(0, b""),
+                        "aws ecr batch-get-image --repository-name aptos/validator --image-ids imageTag=performance_potato --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"performance_potato\n"),
                     ),
                 ]
             )
         )
         git = Git(shell)
-        image_tags = find_recent_images_by_profile_or_features(
-            shell, git, 1, enable_performance_profile=True
+        image_tags = asyncio.run(
+            find_recent_images_by_profile_or_features(
+                shell, git, 1, commit_threshold=1, enable_performance_profile=True
+            )
         )
-        self.assertEqual(list(image_tags), ["performance_potato"])
+        self.assertEqual(image_tags, ["performance_potato"])
         shell.assert_commands(self)
 
     def testFailBothFailpointsPerformance(self) -> None:
         shell = SpyShell(OrderedDict())
         git = Git(shell)
         with self.assertRaises(Exception):
-            find_recent_images_by_profile_or_features(
-                shell,
-                git,
-                1,
-                enable_performance_profile=True,
-                enable_failpoints_feature=True,
+            asyncio.run(
+                find_recent_images_by_profile_or_features(
+                    shell,
+                    git,
+                    1,
+                    enable_performance_profile=True,
+                    enable_failpoints_feature=True,
+                )
             )
 
     def testDidntFindRecentImage(self) -> None:
         shell = SpyShell(
             OrderedDict(
                 [
-                    ("git rev-parse HEAD~0", RunResult(0, b"crab\n")),
+                    ("git rev-list --max-count 1 HEAD", RunResult(0, b"crab\n")),
                     (
-                        "aws ecr describe-images --repository-name aptos/validator --image-ids imageTag=crab",
-                        RunResult(1, b""),
+                        "aws ecr batch-get-image --repository-name aptos/validator --image-ids imageTag=crab --query images[].imageId.imageTag --output text",
+                        RunResult(0, b"\n"),
                     ),
                 ]
             )
         )
         git = Git(shell)
         with self.assertRaises(Exception):
-            list(
+            asyncio.run(
                 find_recent_images_by_profile_or_features(
                     shell, git, 1, commit_threshold=1
                 )
@@ -389,6 +639,23 @@ class ForgeFormattingTests(unittest.TestCase, AssertFixtureMixin):
         filesystem.assert_reads(self)
         filesystem.assert_writes(self)
 
+    def testReportRendersSharedFormatOnce(self) -> None:
+        filesystem = SpyFilesystem({"first": b"banana", "second": b"banana"}, {})
+        context = fake_context(filesystem=filesystem)
+        result = ForgeResult.from_args(ForgeState.PASS, "test")
+        calls = []
+
+        def banana(context: ForgeContext, result: ForgeResult) -> str:
+            calls.append(result)
+            return "banana"
+
+        context.report(
+            result,
+            [ForgeFormatter("first", banana), ForgeFormatter("second", banana)],
+        )
+        filesystem.assert_writes(self)
+        self.assertEqual(calls, [result])
+
     def testHumioLogLink(self) -> None:
         link = get_humio_logs_link("forge-pr-2983")
         self.assertFixture(link, "testHumioLogLink.fixture")
@@ -454,6 +721,55 @@ class ForgeFormattingTests(unittest.TestCase, AssertFixtureMixin):
             "testFormatReport.fixture",
         )
 
+    def testFormatReportFailure(self) -> None:
+        context = fake_context()
+        output = "\n".join(
+            [
+                *[f"setup {i}" for i in range(20)],
+                "====json-report-begin===",
+                json.dumps({"text": "report text"}),
+                "====json-report-end===",
+                "teardown",
+            ]
+        )
+        result = ForgeResult.from_args(ForgeState.FAIL, output)
+        result.set_debugging_output("pods")
+        self.assertEqual(
+            format_report(context, result),
+            "report text\nTrailing Log Lines:\n"
+            + "\n".join([*[f"setup {i}" for i in range(11, 20)], "teardown"])
+            + "\nDebugging output:\npods",
+        )
+
+    def testFormatReportTerminated(self) -> None:
+        context = fake_context()
+        output = "\n".join(f"line {i}" for i in range(20))
+        result = ForgeResult.from_args(ForgeState.FAIL, output)
+        self.assertEqual(
+            format_report(context, result),
+            "Forge test runner terminated:\nTrailing Log Lines:\n"
+            + "\n".join(f"line {i}" for i in range(10, 20))
+            + "\nDebugging output:\n",
+        )
+
+    def testFormatReportCarriageReturns(self) -> None:
+        context = fake_context()
+        output = "\r\n".join(
+            [
+                "setup",
+                "====json-report-begin===",
+                json.dumps({"text": "report text"}),
+                "====json-report-end===",
+                "teardown",
+                "",
+            ]
+        )
+        result = ForgeResult.from_args(ForgeState.FAIL, output)
+        self.assertEqual(
+            format_report(context, result),
+            "report text\nTrailing Log Lines:\nsetup\nteardown\nDebugging output:\n",
+        )
+
     def testSanitizeForgeNamespaceSlashes(self) -> None:
         namespace_with_slash = "banana/apple"
         namespace = sanitize_forge_resource_name(namespace_with_slash)
@@ -464,6 +780,10 @@ class ForgeFormattingTests(unittest.TestCase, AssertFixtureMixin):
         namespace = sanitize_forge_resource_name(namespace_too_long)
         self.assertEqual(namespace, "a" * 64)
 
+    def testSanitizeForgeNamespaceNonAscii(self) -> None:
+        namespace = sanitize_forge_resource_name("banana\u00e9apple")
+        self.assertEqual(namespace, "banana-apple")
+
 
 class ForgeMainTests(unittest.TestCase, AssertFixtureMixin):
     maxDiff = None
@@ -553,11 +873,138 @@ class TestListClusters(unittest.TestCase):
             list_eks_clusters(shell)
             shell.assert_commands(self)
 
+    def testAwsPreflight(self) -> None:
+        fake_clusters = json.dumps(ListClusterResult(clusters=["aptos-forge-big-1"]))
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    ("aws eks list-clusters", RunResult(0, fake_clusters.encode())),
+                    (
+                        "aws sts get-caller-identity",
+                        RunResult(0, b'{"Account": "1234"}'),
+                    ),
+                ]
+            )
+        )
+        self.assertEqual(
+            asyncio.run(aws_preflight(shell)), ("1234", ["aptos-forge-big-1"])
+        )
+        shell.assert_commands(self)
+
 
-def fake_pod_item(name: str, phase: str) -> GetPodsItem:
-    return GetPodsItem(
-        metadata=GetPodsItemMetadata(name=name), status=GetPodsItemStatus(phase=phase)
-    )
+class TestUpdateAwsAuth(unittest.TestCase):
+    def testUpdateAwsAuth(self) -> None:
+        shell = SpyShell(
+            OrderedDict(
+                [
+                    (
+                        "bash -c source auth.sh && env -0",
+                        RunResult(
+                            0,
+                            b"HOME=/root\0AWS_SESSION_TOKEN=line1\nline2\0"
+                            b"AWS_REGION=us-west-2\0",
+                        ),
+                    ),
+                ]
+            )
+        )
+        with patch.dict(os.environ, {}, clear=True):
+            update_aws_auth(shell, "auth.sh")
+            self.assertEqual(
+                dict(os.environ),
+                {"AWS_SESSION_TOKEN": "line1\nline2", "AWS_REGION": "us-west-2"},
+            )
+        shell.assert_commands(self)
+
+
+def fake_pods_output(pods: List[Tuple[str, str]]) -> bytes:
+    return "".join(f"{name}\t{phase}\n" for name, phase in pods).encode()
+
+
+def fake_describe_cluster(name: str) -> bytes:
+    return json.dumps(
+        DescribeClusterResult(
+            cluster=DescribeClusterInfo(
+                name=name,
+                arn=f"arn:aws:eks:us-west-2:1234:cluster/{name}",
+                endpoint=f"https://{name}.eks.amazonaws.com",
+                certificateAuthority=DescribeClusterCertificateAuthority(data="ca"),
+            )
+        )
+    ).encode()
+
+
+def fake_cluster_info(name: str) -> DescribeClusterInfo:
+    return json.loads(fake_describe_cluster(name))["cluster"]
+
+
+class TestRenderKubeconfig(unittest.TestCase):
+    def testRenderKubeconfig(self) -> None:
+        clusters = [
+            fake_cluster_info("aptos-forge-banana"),
+            fake_cluster_info("aptos-forge-apple-2"),
+        ]
+        banana_arn = "arn:aws:eks:us-west-2:1234:cluster/aptos-forge-banana"
+        apple_arn = "arn:aws:eks:us-west-2:1234:cluster/aptos-forge-apple-2"
+        kubeconfig = json.loads(render_kubeconfig(clusters))
+        self.assertEqual(
+            kubeconfig["clusters"],
+            [
+                {
+                    "name": banana_arn,
+                    "cluster": {
+                        "server": "https://aptos-forge-banana.eks.amazonaws.com",
+                        "certificate-authority-data": "ca",
+                    },
+                },
+                {
+                    "name": apple_arn,
+                    "cluster": {
+                        "server": "https://aptos-forge-apple-2.eks.amazonaws.com",
+                        "certificate-authority-data": "ca",
+                    },
+                },
+            ],
+        )
+        self.assertEqual(
+            kubeconfig["contexts"],
+            [
+                {
+                    "name": banana_arn,
+                    "context": {"cluster": banana_arn, "user": banana_arn},
+                },
+                {
+                    "name": apple_arn,
+                    "context": {"cluster": apple_arn, "user": apple_arn},
+                },
+            ],
+        )
+        self.assertEqual(
+            kubeconfig["users"][1]["user"]["exec"],
+            {
+                "apiVersion": "client.authentication.k8s.io/v1beta1",
+                "command": "aws",
+                "args": [
+                    "--region",
+                    "us-west-2",
+                    "eks",
+                    "get-token",
+                    "--cluster-name",
+                    "aptos-forge-apple-2",
+                    "--output",
+                    "json",
+                ],
+                "env": None,
+            },
+        )
+
+    def testRenderKubeconfigWithProfile(self) -> None:
+        clusters = [fake_cluster_info("aptos-forge-banana")]
+        kubeconfig = json.loads(render_kubeconfig(clusters, "forge"))
+        self.assertEqual(
+            kubeconfig["users"][0]["user"]["exec"]["env"],
+            [{"name": "AWS_PROFILE", "value": "forge"}],
+        )
 
 
 class GetForgeJobsTests(unittest.IsolatedAsyncioTestCase):
@@ -567,82 +1014,75 @@ class GetForgeJobsTests(unittest.IsolatedAsyncioTestCase):
                 clusters=["aptos-forge-banana", "banana-1", "aptos-forge-apple-2"]
             )
         ).encode()
-        fake_first_pods = GetPodsResult(
-            items=[
-                fake_pod_item("forge-first", "Running"),
-                fake_pod_item("forge-failed", "Failed"),
-                fake_pod_item("ignore-me", "Failed"),
+        fake_first_pods = fake_pods_output(
+            [
+                ("forge-first", "Running"),
+                ("forge-failed", "Failed"),
             ]
         )
-        fake_second_pods = GetPodsResult(
-            items=[
-                fake_pod_item("forge-second", "Running"),
-                fake_pod_item("forge-succeeded", "Succeeded"),
-                fake_pod_item("me-too", "Failed"),
+        fake_second_pods = fake_pods_output(
+            [
+                ("forge-second", "Running"),
+                ("forge-succeeded", "Succeeded"),
             ]
         )
+        banana_arn = "arn:aws:eks:us-west-2:1234:cluster/aptos-forge-banana"
+        apple_arn = "arn:aws:eks:us-west-2:1234:cluster/aptos-forge-apple-2"
         shell = SpyShell(
             OrderedDict(
                 [
                     ("aws eks list-clusters", RunResult(0, fake_clusters)),
                     (
-                        "aws eks update-kubeconfig --name aptos-forge-banana --kubeconfig temp1",
-                        RunResult(0, b""),
+                        "aws eks describe-cluster --name aptos-forge-banana --output json",
+                        RunResult(0, fake_describe_cluster("aptos-forge-banana")),
                     ),
                     (
-                        "kubectl get pods -n default --kubeconfig temp1 -o json",
-                        RunResult(0, json.dumps(fake_first_pods).encode()),
+                        "aws eks describe-cluster --name aptos-forge-apple-2 --output json",
+                        RunResult(0, fake_describe_cluster("aptos-forge-apple-2")),
                     ),
                     (
-                        "aws eks update-kubeconfig --name aptos-forge-apple-2 --kubeconfig temp2",
-                        RunResult(0, b""),
+                        f"kubectl get pods -n default --kubeconfig temp1 --context {banana_arn} "
+                        "-l app.kubernetes.io/name=forge -o " + GET_PODS_JSONPATH,
+                        RunResult(0, fake_first_pods),
                     ),
                     (
-                        "kubectl get pods -n default --kubeconfig temp2 -o json",
-                        RunResult(0, json.dumps(fake_second_pods).encode()),
+                        f"kubectl get pods -n default --kubeconfig temp1 --context {apple_arn} "
+                        "-l app.kubernetes.io/name=forge -o " + GET_PODS_JSONPATH,
+                        RunResult(0, fake_second_pods),
                     ),
                 ]
             ),
             strict=True,
         )
-        filesystem = SpyFilesystem({}, {}, ["temp1", "temp2"])
+        filesystem = SpyFilesystem(
+            {
+                "temp1": render_kubeconfig(
+                    [
+                        fake_cluster_info("aptos-forge-banana"),
+                        fake_cluster_info("aptos-forge-apple-2"),
+                    ],
+                    os.getenv("AWS_PROFILE"),
+                ),
+            },
+            {},
+            ["temp1"],
+        )
         processes = SpyProcesses()
         context = SystemContext(shell, filesystem, processes)
         jobs = await get_all_forge_jobs(context)
+        banana_cluster = ForgeCluster(
+            name="aptos-forge-banana", kubeconf="temp1", context=banana_arn
+        )
+        apple_cluster = ForgeCluster(
+            name="aptos-forge-apple-2", kubeconf="temp1", context=apple_arn
+        )
         expected_jobs = [
-            ForgeJob(
-                name="forge-first",
-                phase="Running",
-                cluster=ForgeCluster(
-                    name="aptos-forge-banana",
-                    kubeconf="temp1",
-                ),
-            ),
-            ForgeJob(
-                name="forge-failed",
-                phase="Failed",
-                cluster=ForgeCluster(
-                    name="aptos-forge-banana",
-                    kubeconf="temp1",
-                ),
-            ),
-            ForgeJob(
-                name="forge-second",
-                phase="Running",
-                cluster=ForgeCluster(
-                    name="aptos-forge-apple-2",
-                    kubeconf="temp2",
-                ),
-            ),
-            ForgeJob(
-                name="forge-succeeded",
-                phase="Succeeded",
-                cluster=ForgeCluster(
-                    name="aptos-forge-apple-2",
-                    kubeconf="temp2",
-                ),
-            ),
+            ForgeJob(name="forge-first", phase="Running", cluster=banana_cluster),
+            ForgeJob(name="forge-failed", phase="Failed", cluster=banana_cluster),
+            ForgeJob(name="forge-second", phase="Running", cluster=apple_cluster),
+            ForgeJob(name="forge-succeeded", phase="Succeeded", cluster=apple_cluster),
         ]
         self.assertEqual(jobs, expected_jobs)
+        filesystem.assert_writes(self)
         processes.run_atexit()
         filesystem.assert_unlinks(self)